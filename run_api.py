@@ -13,13 +13,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 def main():
     """Main function to run the API server."""
-    from src.api_server import app
+    from waitress import serve
+    from src.api_server import app, stop_event, API_THREADS
     print("Starting YOLOv11-Speed API server...")
     print("Access the web interface at: http://localhost:8000/")
     print("API endpoints available at: http://localhost:8000/api/")
     
-    # Start the API server
-    app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
+    # Start the API server with a bounded pool of request threads
+    try:
+        serve(app, host='0.0.0.0', port=8000, threads=API_THREADS)
+    finally:
+        stop_event.set()  # Let a running pipeline wind down so the process can exit
 
 if __name__ == "__main__":
     main()
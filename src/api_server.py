@@ -9,11 +9,20 @@ import time
 import queue
 import os
 import sys
+import traceback
+
+# Limit NumPy/OpenMP thread pools before they are imported; the pipeline and the
+# request threads already provide the concurrency and extra pools only contend
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 from flask import Flask, jsonify, request, Response, send_from_directory
 from flask_cors import CORS
 import cv2
 import numpy as np
 
+# Keep OpenCV single-threaded; concurrency comes from the pipeline and request threads
+cv2.setNumThreads(1)
+
 # Add src to path for importing modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
@@ -38,6 +47,21 @@ last_config_update = time.time()
 # Configuration locks for thread safety
 config_lock = threading.Lock()
 
+# Number of request-handling threads for the WSGI server. Each open MJPEG stream holds one
+# thread, so keep a couple spare for the control endpoints.
+API_THREADS = int(os.environ.get("API_THREADS", 4))
+
+# Open MJPEG streams each hold a request thread for their whole lifetime; cap them
+# so the control endpoints (/api/start, /api/stop, /api/status, ...) always get a thread
+MAX_VIDEO_STREAMS = max(1, API_THREADS - 2)
+video_stream_slots = threading.BoundedSemaphore(MAX_VIDEO_STREAMS)
+
+# Black frame streamed until the pipeline produces its first processed frame
+PLACEHOLDER_FRAME = cv2.imencode('.jpg', np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+
+# Thread running the current (or still winding down) detection pipeline; only one at a time
+detection_thread = None
+
 app = Flask(__name__, static_folder='../frontend')
 CORS(app)  # Enable CORS for cross-origin requests
 
@@ -383,6 +407,19 @@ def create_detection_pipeline(config):
         stop_event.clear()  # Reset the stop event
 
 
+def run_detection_pipeline(config):
+    """Run the detection pipeline, reporting failures outside its own error handling."""
+    global is_running
+
+    try:
+        create_detection_pipeline(config)
+    except Exception as e:
+        print(f"Detection pipeline failed: {e}")
+        traceback.print_exc()
+        is_running = False
+        stop_event.clear()
+
+
 def enforce_tracking_speed_estimation_rule(config):
     """
     Enforce the rule: if speed estimation is enabled, tracking must also be enabled.
@@ -448,8 +485,14 @@ def generate_video_stream():
                         yield (b'--frame\r\n'
                                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
-                # Small delay to control frame rate if no new frames
-                time.sleep(0.033)  # ~30 FPS when no new frames
+                    # Small delay to control frame rate if no new frames
+                    time.sleep(0.033)  # ~30 FPS when no new frames
+                else:
+                    # Nothing processed yet: send a placeholder so the server keeps writing
+                    # to the socket and notices when the client goes away
+                    yield (b'--frame\r\n'
+                           b'Content-Type: image/jpeg\r\n\r\n' + PLACEHOLDER_FRAME + b'\r\n')
+                    time.sleep(0.2)
 
         except Exception as e:
             print(f"Stream generation error: {e}")
@@ -481,11 +524,15 @@ def get_status():
 @app.route('/api/start', methods=['POST'])
 def start_detection():
     """Start the detection pipeline."""
-    global is_running, current_config, stop_event
+    global is_running, current_config, stop_event, detection_thread
 
     if is_running:
         return jsonify({"error": "Detection is already running"}), 400
 
+    # A stopped pipeline may still be winding down; don't start a second one next to it
+    if detection_thread is not None and detection_thread.is_alive():
+        return jsonify({"error": "Previous detection is still stopping, try again shortly"}), 409
+
     # Reset the stop event when starting
     stop_event.clear()
 
@@ -499,7 +546,7 @@ def start_detection():
 
     # Start the actual detection pipeline in a separate thread
     is_running = True
-    detection_thread = threading.Thread(target=create_detection_pipeline, args=(current_config,))
+    detection_thread = threading.Thread(target=run_detection_pipeline, args=(current_config,))
     detection_thread.daemon = True
     detection_thread.start()
 
@@ -557,10 +604,16 @@ def handle_config():
 @app.route('/api/video_stream')
 def video_stream():
     """MJPEG video stream endpoint."""
-    return Response(
+    if not video_stream_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many open video streams"}), 503
+
+    response = Response(
         generate_video_stream(),
         mimetype='multipart/x-mixed-replace; boundary=frame'
     )
+    # Free the slot once the server closes the response (client gone or stream ended)
+    response.call_on_close(video_stream_slots.release)
+    return response
 
 @app.route('/api/upload_video', methods=['POST'])
 def upload_video():
@@ -612,4 +665,8 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
+    from waitress import serve
+    try:
+        serve(app, host='0.0.0.0', port=5000, threads=API_THREADS)
+    finally:
+        stop_event.set()  # Let a running pipeline wind down so the process can exit
\ No newline at end of file
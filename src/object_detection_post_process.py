@@ -1,30 +1,51 @@
 import cv2
 import numpy as np
-from utils.toolbox import id_to_color
 from speed_estimation import SpeedEstimationManager
 import time
-from collections import defaultdict
+from functools import lru_cache
+from scipy.optimize import linear_sum_assignment
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, matching falls back to NumPy broadcasting
+    njit = None
+
+# Drawing constants (BGR), shared by every drawn box instead of rebuilt per detection
+NORMAL_COLOR = (0, 255, 0)  # Green color for all normal detections
+LOITERING_COLOR = (0, 0, 255)  # Red color for loitering detection
+TEXT_COLOR = (255, 255, 255)  # white
+BORDER_COLOR = (0, 0, 0)  # black
+LOITERING_TEXT = "Loitering"
+LOITERING_TEXT_SIZE = cv2.getTextSize(LOITERING_TEXT, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+
+# Minimum IoU for a tracker box to be drawn with a detection's class
+MATCH_IOU_THRESHOLD = 0.3
 
 
 class LoiteringDetectionManager:
     """
     Manager for detecting loitering objects based on how long they've been present
     """
-    def __init__(self, loitering_threshold=10.0, fps=30.0):
+    def __init__(self, loitering_threshold=10.0, fps=30.0, capacity=64):
         """
         Initialize loitering detection manager
 
         Args:
             loitering_threshold (float): Time threshold in seconds for loitering detection
             fps (float): Frames per second of the video stream
+            capacity (int): Initial number of track slots (grows on demand)
         """
         self._loitering_threshold = loitering_threshold  # seconds
         self._fps = fps  # Store fps for dynamic updates
         self._frame_threshold = loitering_threshold * fps  # convert to frames
-        self.track_start_frames = defaultdict(int)  # track_id -> start frame number
-        self.track_start_times = defaultdict(float)  # track_id -> start timestamp
         self.current_frame = 0
 
+        # Start timestamps live in a dense array indexed by a per-track slot
+        self._slots = {}  # track_id -> slot
+        self._slot_track_ids = np.full(capacity, -1, dtype=np.int64)  # slot -> track_id, -1 when free
+        self._start_times = np.zeros(capacity, dtype=np.float64)  # slot -> start timestamp
+        self._free_slots = list(range(capacity - 1, -1, -1))
+
     @property
     def loitering_threshold(self):
         return self._loitering_threshold
@@ -60,16 +81,27 @@ class LoiteringDetectionManager:
         """Increment the current frame number"""
         self.current_frame += 1
 
+    def _grow(self):
+        """Double the slot capacity when every slot is in use"""
+        capacity = len(self._slot_track_ids)
+        self._slot_track_ids = np.concatenate([self._slot_track_ids, np.full(capacity, -1, dtype=np.int64)])
+        self._start_times = np.concatenate([self._start_times, np.zeros(capacity, dtype=np.float64)])
+        self._free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
+
     def update_track(self, track_id):
         """
-        Update the start frame and timestamp for a track ID if it's not already being tracked
+        Record the start timestamp for a track ID if it's not already being tracked
 
         Args:
             track_id: Unique identifier for the tracked object
         """
-        if track_id not in self.track_start_frames:
-            self.track_start_frames[track_id] = self.current_frame
-            self.track_start_times[track_id] = time.time()
+        if track_id not in self._slots:
+            if not self._free_slots:
+                self._grow()
+            slot = self._free_slots.pop()
+            self._slots[track_id] = slot
+            self._slot_track_ids[slot] = track_id
+            self._start_times[slot] = time.time()
 
     def is_loitering(self, track_id):
         """
@@ -81,13 +113,28 @@ class LoiteringDetectionManager:
         Returns:
             bool: True if the object has been present for longer than the threshold
         """
-        if track_id not in self.track_start_frames:
+        slot = self._slots.get(track_id)
+        if slot is None:
             return False
 
         # Use time-based calculation for more accurate loitering detection
-        current_time = time.time()
-        time_elapsed = current_time - self.track_start_times[track_id]
-        return time_elapsed > self._loitering_threshold
+        time_elapsed = time.time() - self._start_times[slot]
+        return bool(time_elapsed > self._loitering_threshold)
+
+    def is_loitering_bulk(self, track_ids):
+        """
+        Check several track IDs for loitering with a single vectorized comparison
+
+        Args:
+            track_ids: Sequence of track IDs
+
+        Returns:
+            np.ndarray: Boolean array, True where the object has been present for longer than the threshold
+        """
+        slots = np.fromiter((self._slots.get(track_id, -1) for track_id in track_ids),
+                            dtype=np.int64, count=len(track_ids))
+        time_elapsed = time.time() - self._start_times[slots]
+        return (slots >= 0) & (time_elapsed > self._loitering_threshold)
 
     def cleanup_missing_tracks(self, current_track_ids):
         """
@@ -96,15 +143,59 @@ class LoiteringDetectionManager:
         Args:
             current_track_ids: Set of currently active track IDs
         """
-        # Remove tracks that are no longer present
-        ids_to_remove = []
-        for track_id in self.track_start_frames:
-            if track_id not in current_track_ids:
-                ids_to_remove.append(track_id)
+        active_mask = np.zeros(len(self._slot_track_ids), dtype=bool)
+        active_mask[[self._slots[track_id] for track_id in current_track_ids if track_id in self._slots]] = True
 
-        for track_id in ids_to_remove:
-            del self.track_start_frames[track_id]
-            del self.track_start_times[track_id]
+        # Free every occupied slot whose track is no longer present
+        stale_slots = np.flatnonzero((self._slot_track_ids >= 0) & ~active_mask)
+        for slot in stale_slots.tolist():
+            del self._slots[int(self._slot_track_ids[slot])]
+            self._free_slots.append(slot)
+        self._slot_track_ids[stale_slots] = -1
+
+
+class LabelIndex:
+    """
+    Class-index lookups derived from the static label list, built once instead of per frame
+    """
+    def __init__(self, labels, target_labels):
+        """
+        Initialize the label index
+
+        Args:
+            labels (list): List of class labels.
+            target_labels (list): List of class names to detect.
+        """
+        self.label_to_index = {}  # label -> first class index carrying it
+        for idx, label in enumerate(labels):
+            self.label_to_index.setdefault(label, idx)
+
+        target_indices = sorted({self.label_to_index[label] for label in target_labels if label in self.label_to_index})
+        self.target_indices_np = np.array(target_indices, dtype=np.int32)  # sorted class indices to keep
+        self.person_index = self.label_to_index.get("person", -1)  # class index of "person", -1 if absent
+
+
+@lru_cache(maxsize=16)
+def _build_label_index(labels, target_labels):
+    """Build a LabelIndex, cached on the hashable label tuples"""
+    return LabelIndex(labels, target_labels)
+
+
+def get_label_index(labels, target_labels=None):
+    """
+    Return the (cached) LabelIndex for a label list and target labels.
+
+    Args:
+        labels (list): List of class labels.
+        target_labels (list): List of class names to detect.
+
+    Returns:
+        LabelIndex: Precomputed class-index lookups.
+    """
+    # Set default target labels to person and car if none provided
+    if target_labels is None:
+        target_labels = ["person", "car"]
+    return _build_label_index(tuple(labels), tuple(target_labels))
 
 
 def inference_result_handler(original_frame, infer_results, labels, config_data,
@@ -140,30 +231,89 @@ def inference_result_handler(original_frame, infer_results, labels, config_data,
     if target_labels is None:
         target_labels = ["person", "car"]
 
-    # Check if person detection is required for loitering
-    person_class_index = -1
-    if enable_person_only or loitering_detection:
-        for idx, label in enumerate(labels):
-            if label == "person":
-                person_class_index = idx
-                break
+    label_index = get_label_index(labels, target_labels)
 
-        # If person detection is required but not found in labels, disable loitering
-        if enable_person_only and person_class_index == -1:
-            loitering_detection = False
+    # If person detection is required but not found in labels, disable loitering
+    if enable_person_only and label_index.person_index == -1:
+        loitering_detection = False
 
-    detections = extract_detections(original_frame, infer_results, config_data, labels, target_labels)  #should return dict with boxes, classes, scores
+    detections = extract_detections(original_frame, infer_results, config_data, labels, target_labels,
+                                    label_index=label_index)  #should return dict with boxes, classes, scores
     frame_with_detections = draw_detections(detections, original_frame, labels,
                                           tracker=tracker, speed_manager=speed_manager,
                                           target_labels=target_labels,
+                                          label_index=label_index,
                                           loitering_detection=loitering_detection,
                                           loitering_manager=loitering_manager,
                                           loitering_threshold=loitering_threshold,
-                                          enable_person_only=enable_person_only,
-                                          person_class_index=person_class_index)
+                                          enable_person_only=enable_person_only)
     return frame_with_detections
 
 
+@lru_cache(maxsize=1024)
+def _track_id_label(track_id: int) -> str:
+    """Return the cached "ID N" label for a track ID"""
+    return f"ID {track_id}"
+
+
+@lru_cache(maxsize=256)
+def _get_text_patch(text: str):
+    """
+    Render white-on-black outlined text once and cache the tile for later frames.
+
+    Args:
+        text (str): Text to render.
+
+    Returns:
+        tuple: (patch, alpha, ascent) where patch is the BGR text tile, alpha the
+               uint16 outline coverage (0-255) and ascent the baseline offset from the tile top.
+    """
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    margin = 2  # room for the outline stroke
+    (width, height), baseline = cv2.getTextSize(text, font, 0.5, 2)
+    ascent = height + margin
+    shape = (height + baseline + 2 * margin, width + 2 * margin)
+
+    alpha = np.zeros(shape, dtype=np.uint8)
+    cv2.putText(alpha, text, (margin, ascent), font, 0.5, 255, 2, cv2.LINE_AA)
+    patch = np.zeros(shape + (3,), dtype=np.uint8)
+    cv2.putText(patch, text, (margin, ascent), font, 0.5, TEXT_COLOR, 1, cv2.LINE_AA)
+
+    patch = patch.astype(np.uint16)
+    alpha = alpha.astype(np.uint16)[:, :, None]
+    # Tiles are shared by every caller, keep them immutable
+    patch.flags.writeable = False
+    alpha.flags.writeable = False
+    return patch, alpha, ascent
+
+
+def draw_cached_text(image: np.ndarray, text: str, org: tuple):
+    """
+    Draw outlined white text at a baseline origin by blending a cached tile,
+    equivalent to a black thick putText followed by a white thin one. Text that
+    would be cut off by the image border is drawn with putText directly.
+
+    Args:
+        image (np.ndarray): Image to draw on.
+        text (str): Text to draw.
+        org (tuple): (x, y) bottom-left text origin, as for cv2.putText.
+    """
+    patch, alpha, ascent = _get_text_patch(text)
+    x0 = org[0] - 2
+    y0 = org[1] - ascent
+    patch_h, patch_w = alpha.shape[:2]
+
+    # putText clips partially visible glyphs differently from a cropped tile
+    if x0 < 0 or y0 < 0 or x0 + patch_w > image.shape[1] or y0 + patch_h > image.shape[0]:
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        cv2.putText(image, text, org, font, 0.5, BORDER_COLOR, 2, cv2.LINE_AA)
+        cv2.putText(image, text, org, font, 0.5, TEXT_COLOR, 1, cv2.LINE_AA)
+        return
+
+    roi = image[y0:y0 + patch_h, x0:x0 + patch_w]
+    roi[:] = (roi * (255 - alpha) + patch * alpha) // 255
+
+
 def draw_detection(image: np.ndarray, box: list, labels: list, score: float, color: tuple, track=False, speed=None, is_loitering=False):
     """
     Draw box and label for one detection.
@@ -196,61 +346,55 @@ def draw_detection(image: np.ndarray, box: list, labels: list, score: float, col
         else:
             bottom_text = labels[0]
 
-    # Set colors
-    text_color = (255, 255, 255)  # white
-    border_color = (0, 0, 0)      # black
-
     # Draw top text with black border first
-    cv2.putText(image, top_text, (xmin + 4, ymin + 20), font, 0.5, border_color, 2, cv2.LINE_AA)
-    cv2.putText(image, top_text, (xmin + 4, ymin + 20), font, 0.5, text_color, 1, cv2.LINE_AA)
+    cv2.putText(image, top_text, (xmin + 4, ymin + 20), font, 0.5, BORDER_COLOR, 2, cv2.LINE_AA)
+    cv2.putText(image, top_text, (xmin + 4, ymin + 20), font, 0.5, TEXT_COLOR, 1, cv2.LINE_AA)
 
     # Add loitering label if applicable
     if is_loitering:
         # Position loitering label above the detection box
-        loitering_text = "Loitering"
         loitering_y = ymin - 5  # Slightly above the detection box
 
         # Draw loitering label with red background and white text
-        loitering_text_size = cv2.getTextSize(loitering_text, font, 0.5, 1)[0]
+        loitering_text_size = LOITERING_TEXT_SIZE
         loitering_x = xmin  # Start from the left of the box
         cv2.rectangle(image,
                      (loitering_x, loitering_y - loitering_text_size[1] - 4),
                      (loitering_x + loitering_text_size[0], loitering_y + 4),
-                     (0, 0, 255), -1)  # Red background
-        cv2.putText(image, loitering_text, (loitering_x, loitering_y), font, 0.5, (255, 255, 255), 1, cv2.LINE_AA)  # White text
+                     LOITERING_COLOR, -1)  # Red background
+        cv2.putText(image, LOITERING_TEXT, (loitering_x, loitering_y), font, 0.5, TEXT_COLOR, 1, cv2.LINE_AA)  # White text
 
     # Draw bottom text if exists
     if bottom_text:
-        pos = (xmax - 50, ymax - 6)
-        cv2.putText(image, bottom_text, pos, font, 0.5, border_color, 2, cv2.LINE_AA)
-        cv2.putText(image, bottom_text, pos, font, 0.5, text_color, 1, cv2.LINE_AA)
+        draw_cached_text(image, bottom_text, (xmax - 50, ymax - 6))
 
 
-def denormalize_and_rm_pad(box: list, size: int, padding_length: int, input_height: int, input_width: int) -> list:
+def denormalize_and_rm_pad(boxes: np.ndarray, size: int, padding_length: int, input_height: int, input_width: int) -> np.ndarray:
     """
     Denormalize bounding box coordinates and remove padding.
 
     Args:
-        box (list): Normalized bounding box coordinates.
+        boxes (np.ndarray): (N, 4) normalized bounding box coordinates.
         size (int): Size to scale the coordinates.
         padding_length (int): Length of padding to remove.
         input_height (int): Height of the input image.
         input_width (int): Width of the input image.
 
     Returns:
-        list: Denormalized bounding box coordinates with padding removed.
+        np.ndarray: (N, 4) int32 denormalized bounding box coordinates with padding removed.
     """
-    for i, x in enumerate(box):
-        box[i] = int(x * size)
-        if (input_width != size) and (i % 2 != 0):
-            box[i] -= padding_length
-        if (input_height != size) and (i % 2 == 0):
-            box[i] -= padding_length
+    # Scale in float64 like the per-scalar version did, so truncation matches exactly
+    boxes = np.multiply(boxes, size, dtype=np.float64).astype(np.int32)
+    if input_width != size:
+        boxes[:, [1, 3]] -= padding_length
+    if input_height != size:
+        boxes[:, [0, 2]] -= padding_length
 
-    return box
+    return boxes
 
 
-def extract_detections(image: np.ndarray, detections: list, config_data, labels, target_labels=None) -> dict:
+def extract_detections(image: np.ndarray, detections: list, config_data, labels, target_labels=None,
+                       label_index=None) -> dict:
     """
     Extract detections from the input data.
 
@@ -260,21 +404,15 @@ def extract_detections(image: np.ndarray, detections: list, config_data, labels,
         config_data (Dict): Loaded JSON config containing post-processing metadata.
         labels (list): List of class labels.
         target_labels (list): List of class names to detect.
+        label_index (LabelIndex, optional): Precomputed class-index lookups for labels/target_labels.
 
     Returns:
-        dict: Filtered detection results containing 'detection_boxes', 'detection_classes', 'detection_scores', and 'num_detections'.
+        dict: Filtered detection results containing 'detection_boxes' (N, 4), 'detection_classes' (N,),
+              'detection_scores' (N,) arrays and 'num_detections'.
     """
 
-    # Set default target labels to person and car if none provided
-    if target_labels is None:
-        target_labels = ["person", "car"]
-
-    # Define target class indices based on provided target labels
-    target_classes = set(target_labels)
-    target_class_indices = set()
-    for idx, label in enumerate(labels):
-        if label in target_classes:
-            target_class_indices.add(idx)
+    if label_index is None:
+        label_index = get_label_index(labels, target_labels)
 
     visualization_params = config_data["visualization_params"]
     score_threshold = visualization_params.get("score_thres", 0.5)
@@ -286,137 +424,146 @@ def extract_detections(image: np.ndarray, detections: list, config_data, labels,
     size = max(img_height, img_width)
     padding_length = int(abs(img_height - img_width) / 2)
 
-    all_detections = []
+    boxes_per_class = []
+    scores_per_class = []
+    classes_per_class = []
+
+    # Only process target class detections (pedestrians and cars)
+    for class_id in label_index.target_indices_np.tolist():
+        if class_id >= len(detections):
+            continue
+        class_detections = np.asarray(detections[class_id], dtype=np.float32).reshape(-1, 5)
+        keep = class_detections[:, 4] >= score_threshold
+        num_kept = np.count_nonzero(keep)
+        if num_kept == 0:
+            continue
+        boxes_per_class.append(class_detections[keep, :4])
+        scores_per_class.append(class_detections[keep, 4])
+        classes_per_class.append(np.full(num_kept, class_id, dtype=np.int32))
+
+    if not scores_per_class:
+        return {
+            'detection_boxes': np.empty((0, 4), dtype=np.int32),
+            'detection_classes': np.empty(0, dtype=np.int32),
+            'detection_scores': np.empty(0, dtype=np.float32),
+            'num_detections': 0
+        }
+
+    scores = np.concatenate(scores_per_class)
+
+    #take top max_boxes by score descending (for pedestrians and cars only):
+    #partition out the top k in O(N), then sort just those
+    num_top = min(max_boxes, len(scores))
+    if num_top < len(scores):
+        top_idx = np.argpartition(-scores, num_top - 1)[:num_top]
+        top_idx = top_idx[np.argsort(-scores[top_idx], kind="stable")]
+    else:
+        top_idx = np.argsort(-scores, kind="stable")
+
+    #denormalize and remove padding for the kept boxes in one pass
+    boxes = denormalize_and_rm_pad(np.concatenate(boxes_per_class)[top_idx], size, padding_length, img_height, img_width)
 
-    for class_id, detection in enumerate(detections):
-        # Only process target class detections (pedestrians and cars)
-        if class_id in target_class_indices:
-            for det in detection:
-                bbox, score = det[:4], det[4]
-                if score >= score_threshold:
-                    denorm_bbox = denormalize_and_rm_pad(bbox, size, padding_length, img_height, img_width)
-                    all_detections.append((score, class_id, denorm_bbox))
+    return {
+        'detection_boxes': boxes,
+        'detection_classes': np.concatenate(classes_per_class)[top_idx],
+        'detection_scores': scores[top_idx],
+        'num_detections': len(top_idx)
+    }
 
-    #sort all detections by score descending
-    all_detections.sort(reverse=True, key=lambda x: x[0])
 
-    #take top max_boxes (for pedestrians and cars only)
-    top_detections = all_detections[:max_boxes]
+def _pack_tracker_input(boxes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """
+    Pack detections into a preallocated tracker input array.
 
-    scores, class_ids, boxes = zip(*top_detections) if top_detections else ([], [], [])
+    Args:
+        boxes (np.ndarray): (N, 4) detection boxes.
+        scores (np.ndarray): (N,) detection confidences.
 
-    return {
-        'detection_boxes': list(boxes),
-        'detection_classes': list(class_ids),
-        'detection_scores': list(scores),
-        'num_detections': len(top_detections)
-    }
+    Returns:
+        np.ndarray: (N, 5) float32 array of [xmin, ymin, xmax, ymax, score] rows.
+    """
+    dets_for_tracker = np.empty((len(scores), 5), dtype=np.float32)
+    dets_for_tracker[:, :4] = boxes
+    dets_for_tracker[:, 4] = scores
+    return dets_for_tracker
 
 
 def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None, speed_manager=None, target_labels=None,
-                    loitering_detection=False, loitering_manager=None, loitering_threshold=10.0, enable_person_only=False, person_class_index=-1):
+                    loitering_detection=False, loitering_manager=None, loitering_threshold=10.0, enable_person_only=False,
+                    label_index=None):
     """
     Draw detections or tracking results on the image.
 
     Args:
-        detections (dict): Raw detection outputs.
+        detections (dict): Detection outputs from extract_detections, already filtered to target_labels
+                           (not re-checked here).
         img_out (np.ndarray): Image to draw on.
         labels (list): List of class labels.
         enable_tracking (bool): Whether to use tracker output (ByteTrack).
         tracker (BYTETracker, optional): ByteTrack tracker instance.
         speed_manager (SpeedEstimationManager, optional): Speed estimation manager for speed calculation.
         target_labels (list): List of class names to detect.
+        label_index (LabelIndex, optional): Precomputed class-index lookups for labels/target_labels.
 
     Returns:
         np.ndarray: Annotated image.
     """
 
-    # Set default target labels to person and car if none provided
-    if target_labels is None:
-        target_labels = ["person", "car"]
-
-    # Define target class indices based on provided target labels
-    target_classes_set = set(target_labels)
-    target_class_indices = set()
-    for idx, label in enumerate(labels):
-        if label in target_classes_set:
-            target_class_indices.add(idx)
-
-    #extract detection data from the dictionary
-    boxes = detections["detection_boxes"]  # List of [xmin,ymin,xmaxm, ymax] boxes
-    scores = detections["detection_scores"]  # List of detection confidences
+    #nothing to track or draw on empty frames (also skips the tracker update, as before)
     num_detections = detections["num_detections"]  # Total number of valid detections
-    classes = detections["detection_classes"]  # List of class indices per detection
-
-    # Filter to only include pedestrian and car detections
-    target_boxes = []
-    target_scores = []
-    target_classes_filtered = []
+    if num_detections == 0:
+        return img_out
 
-    for i in range(num_detections):
-        if classes[i] in target_class_indices:
-            target_boxes.append(boxes[i])
-            target_scores.append(scores[i])
-            target_classes_filtered.append(classes[i])
+    #extract detection data from the dictionary (already filtered to target classes)
+    boxes = detections["detection_boxes"]  # (N, 4) array of [xmin, ymin, xmax, ymax] boxes
+    scores = detections["detection_scores"]  # (N,) array of detection confidences
+    classes = detections["detection_classes"]  # (N,) array of class indices per detection
 
-    # Update the values to only include pedestrians and cars
-    boxes = target_boxes
-    scores = target_scores
-    classes = target_classes_filtered
-    num_detections = len(target_boxes)
+    if label_index is None:
+        label_index = get_label_index(labels, target_labels)
+    person_class_index = label_index.person_index
 
     if tracker:
-        dets_for_tracker = []
-
-        #Convert detection format to [xmin,ymin,xmaxm ymax,score] for tracker
-        for idx in range(num_detections):
-            box = boxes[idx]  #[x, y, w, h]
-            score = scores[idx]
-            dets_for_tracker.append([*box, score])
+        detection_array = np.asarray(boxes, dtype=np.float32)
 
-        #skip tracking if no detections passed
-        if not dets_for_tracker:
-            return img_out
+        #Convert detection format to [xmin, ymin, xmax, ymax, score] for tracker
+        dets_for_tracker = _pack_tracker_input(boxes, scores)
 
         #run BYTETracker and get active tracks
-        online_targets = tracker.update(np.array(dets_for_tracker))
+        online_targets = tracker.update(dets_for_tracker)
 
         # Update loitering manager with the current frame count
         if loitering_manager:
             loitering_manager.update_frame_count()
 
-        #draw tracked bounding boxes with ID labels
+        #assign detections to active tracks one-to-one
+        tracks_tlbr = np.array([track.tlbr for track in online_targets], dtype=np.float64).reshape(-1, 4)
+        best_indices, matched_classes = match_tracks_to_detections(tracks_tlbr, detection_array, classes)
+
+        # Check loitering for all matched person tracks at once, regardless of enable_person_only setting
+        loitering_flags = np.zeros(len(online_targets), dtype=bool)
+        if loitering_detection and loitering_manager and person_class_index != -1:
+            person_positions = np.flatnonzero(matched_classes == person_class_index)
+            person_track_ids = [online_targets[i].track_id for i in person_positions.tolist()]
+            for track_id in person_track_ids:
+                loitering_manager.update_track(track_id)
+            loitering_flags[person_positions] = loitering_manager.is_loitering_bulk(person_track_ids)
+
+        #draw tracked bounding boxes with ID labels, using integer (top-left, bottom-right) boxes cast once
         current_track_ids = set()
-        for track in online_targets:
+        for track, bbox, best_idx, class_id, is_loitering in zip(online_targets, tracks_tlbr.astype(np.int32).tolist(),
+                                                                 best_indices.tolist(), matched_classes.tolist(),
+                                                                 loitering_flags.tolist()):
             track_id = track.track_id  #unique tracker ID
-            x1, y1, x2, y2 = track.tlbr  #bounding box (top-left, bottom-right)
-            xmin, ymin, xmax, ymax = map(int, [x1, y1, x2, y2])
-            best_idx = find_best_matching_detection_index(track.tlbr, boxes)
-            if best_idx is not None:  # Only process if we found a matching detection
+            if best_idx >= 0:  # Only process if we found a matching detection
                 current_track_ids.add(track_id)
 
-                # Use green color for all normal detections
-                color = (0, 255, 0)  # Green color for all normal detections
-
-                # Check for loitering if enabled and person is detected
-                is_loitering = False
-                if loitering_detection:
-                    # Only check loitering for person objects, regardless of enable_person_only setting
-                    is_person = (person_class_index != -1 and classes[best_idx] == person_class_index)
-
-                    if is_person and loitering_manager:
-                        # Update the loitering manager with this track
-                        loitering_manager.update_track(track_id)
-                        is_loitering = loitering_manager.is_loitering(track_id)
-
-                        # Change color to red if loitering
-                        if is_loitering:
-                            color = (0, 0, 255)  # Red color for loitering detection
+                # Red for loitering persons, green for all normal detections
+                color = LOITERING_COLOR if is_loitering else NORMAL_COLOR
 
                 # Calculate and display speed if speed estimation is enabled
                 speed = None
                 if speed_manager is not None:
-                    bbox = [xmin, ymin, xmax, ymax]
                     speed = speed_manager.estimate_speed(track_id, bbox)
 
                 # Get smoothed speed for display
@@ -427,7 +574,7 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
                         display_speed = smoothed_speed
 
                 # Only draw pedestrian detections with tracking info and speed
-                draw_detection(img_out, [xmin, ymin, xmax, ymax], [labels[classes[best_idx]], f"ID {track_id}"],
+                draw_detection(img_out, bbox, [labels[class_id], _track_id_label(track_id)],
                                track.score * 100.0, color, track=True, speed=display_speed, is_loitering=is_loitering)
 
         # Clean up the loitering manager with tracks that are no longer present
@@ -438,53 +585,112 @@ def draw_detections(detections: dict, img_out: np.ndarray, labels, tracker=None,
     else:
         #No tracking — draw raw model detections (only pedestrians and cars)
         for idx in range(num_detections):
-            color = (0, 255, 0)  # Green color for all normal detections
-            draw_detection(img_out, boxes[idx], [labels[classes[idx]]], scores[idx] * 100.0, color, is_loitering=False)
+            draw_detection(img_out, boxes[idx], [labels[classes[idx]]], scores[idx] * 100.0, NORMAL_COLOR, is_loitering=False)
 
     return img_out
 
 
-def find_best_matching_detection_index(track_box, detection_boxes):
+def match_tracks_to_detections(track_boxes, detection_boxes, detection_classes, iou_threshold=MATCH_IOU_THRESHOLD):
     """
-    Finds the index of the detection box with the highest IoU relative to the given tracking box.
+    Assigns detections to tracks one-to-one by maximizing the total IoU (Hungarian assignment).
 
     Args:
-        track_box (list or tuple): The tracking box in [x_min, y_min, x_max, y_max] format.
-        detection_boxes (list): List of detection boxes in [x_min, y_min, x_max, y_max] format.
+        track_boxes (np.ndarray): (T, 4) tracking boxes in [x_min, y_min, x_max, y_max] format.
+        detection_boxes (np.ndarray): (D, 4) detection boxes in [x_min, y_min, x_max, y_max] format.
+        detection_classes (np.ndarray): (D,) class index per detection.
+        iou_threshold (float): Minimum IoU for an assigned pair to count as a match.
 
     Returns:
-        int or None: Index of the best matching detection, or None if no match is found.
+        tuple: (best_idx, class_idx) arrays of shape (T,); both are -1 for tracks without a
+               matched detection.
     """
-    best_iou = 0
-    best_idx = -1
+    num_tracks = len(track_boxes)
+    best_idx = np.full(num_tracks, -1, dtype=np.int64)
+    class_idx = np.full(num_tracks, -1, dtype=np.int64)
+    if num_tracks == 0 or len(detection_boxes) == 0:
+        return best_idx, class_idx
 
-    for i, det_box in enumerate(detection_boxes):
-        iou = compute_iou(track_box, det_box)
-        if iou > best_iou:
-            best_iou = iou
-            best_idx = i
+    iou = compute_iou_matrix(track_boxes, detection_boxes)
+    rows, cols = linear_sum_assignment(iou, maximize=True)
+    matched = iou[rows, cols] >= iou_threshold
+    rows, cols = rows[matched], cols[matched]
 
-    return best_idx if best_idx != -1 else None
+    best_idx[rows] = cols
+    class_idx[rows] = np.asarray(detection_classes)[cols]
+    return best_idx, class_idx
 
 
-def compute_iou(boxA, boxB):
+def compute_iou_matrix(boxesA, boxesB):
     """
-    Compute Intersection over Union (IoU) between two bounding boxes.
+    Compute the pairwise Intersection over Union (IoU) between two sets of bounding boxes.
 
     IoU measures the overlap between two boxes:
         IoU = (area of intersection) / (area of union)
     Values range from 0 (no overlap) to 1 (perfect overlap).
 
     Args:
-        boxA (list or tuple): [x_min, y_min, x_max, y_max]
-        boxB (list or tuple): [x_min, y_min, x_max, y_max]
+        boxesA (np.ndarray): (N, 4) boxes in [x_min, y_min, x_max, y_max] format.
+        boxesB (np.ndarray): (M, 4) boxes in [x_min, y_min, x_max, y_max] format.
+
+    Returns:
+        np.ndarray: (N, M) IoU values between 0 and 1.
+    """
+    if iou_matrix_kernel is not None:
+        return iou_matrix_kernel(np.ascontiguousarray(boxesA, dtype=np.float32),
+                                 np.ascontiguousarray(boxesB, dtype=np.float32))
+
+    xA = np.maximum(boxesA[:, None, 0], boxesB[None, :, 0])
+    yA = np.maximum(boxesA[:, None, 1], boxesB[None, :, 1])
+    xB = np.minimum(boxesA[:, None, 2], boxesB[None, :, 2])
+    yB = np.minimum(boxesA[:, None, 3], boxesB[None, :, 3])
+    inter = np.clip(xB - xA, 0, None) * np.clip(yB - yA, 0, None)
+    areaA = np.maximum(1e-5, (boxesA[:, 2] - boxesA[:, 0]) * (boxesA[:, 3] - boxesA[:, 1]))
+    areaB = np.maximum(1e-5, (boxesB[:, 2] - boxesB[:, 0]) * (boxesB[:, 3] - boxesB[:, 1]))
+    return inter / (areaA[:, None] + areaB[None, :] - inter + 1e-5)
+
+
+def _iou_matrix(tracks, dets):
+    """
+    Compiled IoU matrix: detections are swept in x_min order, so the scan for a track
+    stops at the first detection starting right of it and only spatially overlapping
+    pairs are scored; all other entries stay zero.
+
+    Args:
+        tracks (np.ndarray): (T, 4) float32 tracking boxes in [x_min, y_min, x_max, y_max] format.
+        dets (np.ndarray): (D, 4) float32 detection boxes in [x_min, y_min, x_max, y_max] format.
 
     Returns:
-        float: IoU value between 0 and 1.
+        np.ndarray: (T, D) float32 IoU values between 0 and 1.
     """
-    xA, yA = max(boxA[0], boxB[0]), max(boxA[1], boxB[1])
-    xB, yB = min(boxA[2], boxB[2]), min(boxA[3], boxB[3])
-    inter = max(0, xB - xA) * max(0, yB - yA)
-    areaA = max(1e-5, (boxA[2] - boxA[0]) * (boxA[3] - boxA[1]))
-    areaB = max(1e-5, (boxB[2] - boxB[0]) * (boxB[3] - boxB[1]))
-    return inter / (areaA + areaB - inter + 1e-5)
+    num_tracks = tracks.shape[0]
+    num_dets = dets.shape[0]
+    iou = np.zeros((num_tracks, num_dets), dtype=np.float32)
+    order = np.argsort(dets[:, 0])
+
+    for t in range(num_tracks):
+        tx1, ty1, tx2, ty2 = tracks[t, 0], tracks[t, 1], tracks[t, 2], tracks[t, 3]
+        area_t = max(1e-5, (tx2 - tx1) * (ty2 - ty1))
+        for k in range(num_dets):
+            d = order[k]
+            if dets[d, 0] >= tx2:
+                break  # every remaining detection starts right of this track
+            iw = min(tx2, dets[d, 2]) - max(tx1, dets[d, 0])
+            ih = min(ty2, dets[d, 3]) - max(ty1, dets[d, 1])
+            if iw <= 0 or ih <= 0:
+                continue
+            inter = iw * ih
+            area_d = max(1e-5, (dets[d, 2] - dets[d, 0]) * (dets[d, 3] - dets[d, 1]))
+            iou[t, d] = inter / (area_t + area_d - inter + 1e-5)
+
+    return iou
+
+
+iou_matrix_kernel = None
+if njit is not None:
+    try:
+        iou_matrix_kernel = njit(fastmath=True, cache=True, boundscheck=False)(_iou_matrix)
+        # Compile (or load from the on-disk cache) now so the first frame doesn't pay the JIT cost
+        iou_matrix_kernel(np.zeros((1, 4), dtype=np.float32), np.zeros((1, 4), dtype=np.float32))
+    except Exception as e:  # a failed compile must not break import, fall back to NumPy
+        print(f"Numba IoU kernel unavailable, using NumPy fallback: {e}")
+        iou_matrix_kernel = None